@@ -19,8 +19,12 @@ import os
 import sys
 import json
 import argparse
-from datetime import datetime
+import functools
+from datetime import datetime, timezone
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -33,33 +37,50 @@ class PlandekDeploymentAPI:
         if not self.api_token:
             raise ValueError("Plandek API token is required. Set PLANDEK_API_TOKEN environment variable or pass it as an argument.")
 
-    def send_deployment(self, deployment_data):
-        """Send deployment data to Plandek API"""
-        headers = {
+        # Reuse one connection pool (and keep-alive) for every request
+        self.session = requests.Session()
+        self.session.headers.update({
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json",
             "accept": "application/json"
-        }
+        })
+        # Only failed connections are retried: POST /deployment is not idempotent, so
+        # retrying on a 429/5xx response could record the same deployment twice
+        retry = Retry(total=3, backoff_factor=0.3)
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the pooled connections"""
+        self.session.close()
 
-        response = requests.post(
+    def send_deployment(self, deployment_data):
+        """Send deployment data to Plandek API"""
+        response = self.session.post(
             f"{self.base_url}/deployment",
-            headers=headers,
-            json=deployment_data
+            data=orjson.dumps(deployment_data)
         )
 
         if response.status_code == 401:
             raise Exception("Authentication failed. Please check your API token.")
         
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
 
-def parse_arguments():
+@functools.cache
+def _build_parser():
+    """Build the argument parser once and reuse it for later calls"""
     parser = argparse.ArgumentParser(description="Send GitLab deployment data to Plandek API")
-    parser.add_argument("--client-key", required=True, help="Plandek client key")
-    parser.add_argument("--pipeline", required=True, help="Pipeline identifier")
-    parser.add_argument("--build", required=True, help="Build identifier")
-    parser.add_argument("--status", required=True, choices=["success", "failure"], help="Deployment status")
-    parser.add_argument("--commits", required=True, help="Comma-separated list of commit hashes")
+    parser.add_argument("--client-key", help="Plandek client key (required unless --batch-file is given)")
+    parser.add_argument("--pipeline", help="Pipeline identifier (required unless --batch-file is given)")
+    parser.add_argument("--build", help="Build identifier (required unless --batch-file is given)")
+    parser.add_argument("--status", choices=["success", "failure"], help="Deployment status (required unless --batch-file is given)")
+    parser.add_argument("--commits", help="Comma-separated list of commit hashes (required unless --batch-file is given)")
     parser.add_argument("--branch-name", help="Branch name")
     parser.add_argument("--environment", help="Environment name (e.g., production, staging)")
     parser.add_argument("--is-prod", action="store_true", help="Flag to indicate if this is a production deployment")
@@ -67,16 +88,44 @@ def parse_arguments():
     parser.add_argument("--release-id", help="Application or service release ID")
     parser.add_argument("--context", help="Additional context for the deployment")
     parser.add_argument("--api-token", help="Plandek API token (can also be set via PLANDEK_API_TOKEN env var)")
-    
-    return parser.parse_args()
+    parser.add_argument("--batch-file", help="NDJSON file with one deployment payload per line, sent instead of the arguments above")
+    return parser
 
-def main():
-    args = parse_arguments()
-    
-    # Initialize API client
-    api = PlandekDeploymentAPI(api_token=args.api_token)
-    
-    # Prepare deployment data
+def parse_arguments():
+    parser = _build_parser()
+    args = parser.parse_args()
+    required = [
+        ("--client-key", args.client_key),
+        ("--pipeline", args.pipeline),
+        ("--build", args.build),
+        ("--status", args.status),
+        ("--commits", args.commits),
+    ]
+    optional = [
+        ("--branch-name", args.branch_name),
+        ("--environment", args.environment),
+        ("--is-prod", args.is_prod or None),
+        ("--service-name", args.service_name),
+        ("--release-id", args.release_id),
+        ("--context", args.context),
+    ]
+    if args.batch_file:
+        # Batch payloads come from the file, so these arguments would be silently ignored
+        conflicting = [option for option, value in required + optional if value is not None]
+        if conflicting:
+            parser.error(f"--batch-file cannot be combined with: {', '.join(conflicting)}")
+    else:
+        missing = [option for option, value in required if value is None]
+        if missing:
+            parser.error(f"the following arguments are required: {', '.join(missing)}")
+    return args
+
+def utc_timestamp():
+    """Current UTC time in the format expected for deployed_at"""
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+def build_deployment_data(args):
+    """Build the deployment payload from parsed command line arguments"""
     deployment_data = {
         "client_key": args.client_key,
         "pipeline": args.pipeline,
@@ -84,25 +133,61 @@ def main():
         "status": args.status,
         "commits": args.commits.split(","),
         "calculate_commits_in_build": False,
-        "deployed_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        "deployed_at": utc_timestamp()
     }
 
     # Add optional fields if provided
-    if args.branch_name:
-        deployment_data["branch_name"] = args.branch_name
-    if args.environment:
-        deployment_data["environment_name"] = args.environment
-        deployment_data["is_prod_environment"] = args.is_prod
-    if args.service_name:
-        deployment_data["application_or_service_name"] = args.service_name
-    if args.release_id:
-        deployment_data["application_or_service_release_id"] = args.release_id
-    if args.context:
-        deployment_data["context"] = args.context
+    optional = {
+        "branch_name": args.branch_name,
+        "environment_name": args.environment,
+        "is_prod_environment": args.is_prod if args.environment or args.is_prod else None,
+        "application_or_service_name": args.service_name,
+        "application_or_service_release_id": args.release_id,
+        "context": args.context,
+    }
+    deployment_data.update({k: v for k, v in optional.items() if v not in (None, "")})
+    return deployment_data
+
+def load_batch_file(path):
+    """Read deployment payloads from an NDJSON file as (line number, payload) pairs"""
+    deployments = []
+    with open(path, "rb") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                deployment = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                raise ValueError(f"{path} line {line_number}: invalid JSON: {e}") from e
+            if not isinstance(deployment, dict):
+                raise ValueError(f"{path} line {line_number}: expected a JSON object")
+            deployment.setdefault("deployed_at", utc_timestamp())
+            deployments.append((line_number, deployment))
+    return deployments
+
+def send_batch(api, path, deployments):
+    """Send batch deployments in order, printing each response as soon as it arrives"""
+    for line_number, deployment in deployments:
+        try:
+            response = api.send_deployment(deployment)
+        except Exception as e:
+            raise Exception(f"{path} line {line_number}: {e} (deployments on earlier lines were already sent)") from e
+        print(json.dumps(response), flush=True)
+
+def main():
+    args = parse_arguments()
 
     try:
-        response = api.send_deployment(deployment_data)
-        print(json.dumps(response, indent=2))
+        # Read the whole batch first so a malformed line stops the run before anything is sent
+        if args.batch_file:
+            deployments = load_batch_file(args.batch_file)
+
+        with PlandekDeploymentAPI(api_token=args.api_token) as api:
+            if args.batch_file:
+                send_batch(api, args.batch_file, deployments)
+            else:
+                response = api.send_deployment(build_deployment_data(args))
+                print(json.dumps(response, indent=2))
         sys.exit(0)
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
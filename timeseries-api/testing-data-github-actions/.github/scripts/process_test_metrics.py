@@ -9,12 +9,18 @@ already exist and then adds the datapoints.
 
 import os
 import sys
+import gzip
 import json
+import asyncio
 import logging
+import tempfile
+import email.utils
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 
-import requests
+import httpx
+import msgspec
+import orjson
 from dotenv import load_dotenv
 
 # Configure logging
@@ -23,16 +29,148 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # Load environment variables from .env file if it exists
 load_dotenv()
 
+# Repository and workflow context; fixed for the lifetime of a CI run
+_REPO = os.getenv("GITHUB_REPOSITORY", "unknown").replace('/', '.')
+_WORKFLOW = os.getenv("GITHUB_WORKFLOW", "unknown").replace(' ', '_').lower()
+_RUN_ID = os.getenv("GITHUB_RUN_ID", "")
+
+# Timeseries names for each metric
+_METRIC_TOTAL = f"{_REPO}.tests.total"
+_METRIC_PASSED = f"{_REPO}.tests.passed"
+_METRIC_FAILED = f"{_REPO}.tests.failed"
+_METRIC_SKIPPED = f"{_REPO}.tests.skipped"
+_METRIC_SUCCESS_RATE = f"{_REPO}.tests.success_rate"
+_METRIC_DURATION = f"{_REPO}.tests.duration_seconds"
+_METRIC_WORKFLOW = f"{_REPO}.workflow"
+
+# Short connect timeout so a hung socket can't stall the CI job
+REQUEST_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+CONNECTION_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=20)
+
+# Transient responses are retried with exponential backoff. GET is safe to repeat on any of
+# these. POST (creating a timeseries, adding datapoints) is not idempotent: after a 500/502/504
+# the server may already have committed it, so POST is only retried on 429/503, where the
+# request was refused rather than possibly processed.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+POST_RETRY_STATUSES = frozenset({429, 503})
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 0.5
+# Upper bound on a server-requested Retry-After wait, so one response can't stall the CI job
+MAX_RETRY_AFTER = 60.0
+
+# With TIMESERIES_GZIP_REQUESTS=true, request bodies larger than this many bytes are sent
+# gzip-compressed. Off by default, as the API does not document Content-Encoding on requests.
+GZIP_MIN_SIZE = 1024
+
+def _load_timeseries_cache(base_url: str) -> Dict[str, Dict[str, Any]]:
+    """Load the timeseries cached for base_url from TIMESERIES_CACHE_FILE, if set."""
+    path = os.getenv("TIMESERIES_CACHE_FILE")
+    if not path:
+        return {}
+    try:
+        with open(os.path.expanduser(path)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    # Ignore a cache with an unexpected shape rather than failing every send
+    cache = data.get(base_url) if isinstance(data, dict) else None
+    if not isinstance(cache, dict) or not all(
+        isinstance(timeseries, dict) and "timeseries_id" in timeseries
+        for timeseries in cache.values()
+    ):
+        return {}
+    return cache
+
+def _save_timeseries_cache(base_url: str, cache: Dict[str, Dict[str, Any]]) -> None:
+    """Persist the timeseries cached for base_url to TIMESERIES_CACHE_FILE, if set."""
+    path = os.getenv("TIMESERIES_CACHE_FILE")
+    if not path:
+        return
+    path = os.path.expanduser(path)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    data[base_url] = cache
+    try:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Write a temporary file and rename it over the cache so it is never left half-written
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning("Could not save timeseries cache to %s: %s", path, e)
+
 class TimeseriesAPIError(Exception):
     """Custom exception for Timeseries API errors"""
-    pass
+    
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        # HTTP status of the failed response, or None if no response was received
+        self.status_code = status_code
+
+def _encode_json_body(payload: Any) -> Dict[str, Any]:
+    """Build the request kwargs for a JSON body, gzip-compressing large bodies if enabled."""
+    body = orjson.dumps(payload)
+    gzip_enabled = os.getenv("TIMESERIES_GZIP_REQUESTS", "").lower() in ("1", "true", "yes")
+    if not gzip_enabled or len(body) <= GZIP_MIN_SIZE:
+        return {"content": body}
+    return {
+        "content": gzip.compress(body, compresslevel=3),
+        "headers": {"Content-Encoding": "gzip"}
+    }
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring the response's Retry-After header if present."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(0.0, float(retry_after)), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+            return min(max(0.0, delay), MAX_RETRY_AFTER)
+        except (TypeError, ValueError):
+            pass
+    return RETRY_BACKOFF_FACTOR * 2 ** attempt
 
-class TimeseriesAPI:
-    """Client for interacting with the Plandek Timeseries API."""
+def _api_error(response: httpx.Response) -> TimeseriesAPIError:
+    """Build the error for a failed response whose body has already been read."""
+    if response.status_code == 401:
+        return TimeseriesAPIError("Authentication failed. Please check your API key.", status_code=401)
+    
+    error_msg = f"{response.status_code} {response.reason_phrase} for url: {response.url}"
+    try:
+        error_data = orjson.loads(response.content)
+        error_msg = f"{error_msg}: {error_data.get('message', 'No error details')}"
+    except ValueError:
+        error_msg = f"{error_msg}: {response.text}"
+    return TimeseriesAPIError(f"API request failed: {error_msg}", status_code=response.status_code)
+
+class AsyncTimeseriesAPI:
+    """Asynchronous client for the Plandek Timeseries API.
+    
+    Requests for different timeseries can run concurrently. Use it as an
+    async context manager so the underlying client is closed.
+    """
     
     def __init__(self, api_key: str = None, base_url: str = None):
         """Initialize the Timeseries API client.
@@ -50,80 +188,130 @@ class TimeseriesAPI:
         if not self.api_key:
             raise ValueError("TIMESERIES_API_KEY environment variable is required")
         
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        })
+        # HTTP/2 multiplexes the concurrent requests over a single connection
+        self.session = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            },
+            timeout=REQUEST_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(http2=True, limits=CONNECTION_LIMITS, retries=MAX_RETRIES)
+        )
+        
+        # Timeseries already resolved by name, so repeat sends skip the lookup
+        self._ts_cache: Dict[str, Dict[str, Any]] = _load_timeseries_cache(self.base_url)
+        self._ts_cache_dirty = False
+    
+    async def __aenter__(self) -> "AsyncTimeseriesAPI":
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
     
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+    async def close(self) -> None:
+        """Save any newly resolved timeseries and close the underlying HTTP client."""
+        if self._ts_cache_dirty:
+            _save_timeseries_cache(self.base_url, self._ts_cache)
+            self._ts_cache_dirty = False
+        await self.session.aclose()
+    
+    async def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Make an HTTP request to the API."""
         url = f"{self.base_url}{endpoint}"
+        if "json" in kwargs:
+            kwargs.update(_encode_json_body(kwargs.pop("json")))
+        retry_statuses = RETRY_STATUSES if method == "GET" else POST_RETRY_STATUSES
         try:
-            response = self.session.request(method, url, **kwargs)
-            
-            if response.status_code == 401:
-                raise TimeseriesAPIError("Authentication failed. Please check your API key.")
-            
-            response.raise_for_status()
-            return response.json() if response.content else {}
+            delay = 0.0
+            for attempt in range(MAX_RETRIES + 1):
+                if attempt:
+                    await asyncio.sleep(delay)
+                
+                # Stream so empty bodies are never read and the connection is released promptly
+                async with self.session.stream(method, url, **kwargs) as response:
+                    if response.is_success:
+                        if response.status_code == 204 or response.headers.get("Content-Length") == "0":
+                            return {}
+                        content = await response.aread()
+                        return orjson.loads(content) if content else {}
+                    
+                    if response.status_code in retry_statuses and attempt < MAX_RETRIES:
+                        delay = _retry_delay(response, attempt)
+                        continue
+                    await response.aread()
+                    raise _api_error(response)
             
-        except requests.exceptions.RequestException as e:
-            error_msg = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_data = e.response.json()
-                    error_msg = f"{e}: {error_data.get('message', 'No error details')}"
-                except ValueError:
-                    error_msg = f"{e}: {e.response.text}"
-            raise TimeseriesAPIError(f"API request failed: {error_msg}") from e
+        except httpx.HTTPError as e:
+            raise TimeseriesAPIError(f"API request failed: {e}") from e
     
-    def ensure_timeseries_exists(self, name: str) -> Dict[str, Any]:
+    async def ensure_timeseries_exists(self, name: str) -> Dict[str, Any]:
         """Ensure a timeseries exists, creating it if necessary."""
+        if name in self._ts_cache:
+            return self._ts_cache[name]
+        
         try:
             # Try to get the timeseries
-            return self._make_request("GET", f"/timeseries_by_name/{name}")
+            timeseries = await self._make_request("GET", f"/timeseries_by_name/{name}")
         except TimeseriesAPIError as e:
-            if "Not Found" in str(e):
-                # Timeseries doesn't exist, create it
-                logger.info(f"Creating new timeseries: {name}")
-                return self._make_request(
-                    "POST",
-                    "/timeseries",
-                    json={"name": name}
-                )
-            raise
+            if e.status_code != 404:
+                raise
+            # Timeseries doesn't exist, create it
+            logger.info("Creating new timeseries: %s", name)
+            timeseries = await self._make_request(
+                "POST",
+                "/timeseries",
+                json={"name": name}
+            )
+        
+        self._ts_cache[name] = timeseries
+        self._ts_cache_dirty = True
+        return timeseries
     
-    def add_datapoints(self, timeseries_name: str, datapoints: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def add_datapoints(self, timeseries_name: str, datapoints: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Add datapoints to a timeseries.
         
         Args:
             timeseries_name: Name of the timeseries to add datapoints to
-            datapoints: List of datapoint dictionaries with 'timestamp' and 'value' keys
+            datapoints: List of datapoint dictionaries with only 'timestamp' and 'value'
+                keys; they are sent to the API as-is
             
         Returns:
             API response
         """
-        # Ensure the timeseries exists
-        timeseries = self.ensure_timeseries_exists(timeseries_name)
-        timeseries_id = timeseries["timeseries_id"]
-        
-        # Prepare datapoints in the expected format
-        formatted_datapoints = []
-        for dp in datapoints:
-            formatted_datapoints.append({
-                "timestamp": dp["timestamp"],
-                "value": dp["value"]
-            })
+        # Known timeseries are posted to directly; only new ones need a lookup
+        was_cached = timeseries_name in self._ts_cache
+        timeseries = await self.ensure_timeseries_exists(timeseries_name)
         
         # Add datapoints to the timeseries (limit of 1000 per request)
-        return self._make_request(
+        try:
+            return await self._make_request(
+                "POST",
+                f"/timeseries/{timeseries['timeseries_id']}/datapoints",
+                json=datapoints
+            )
+        except TimeseriesAPIError as e:
+            if not was_cached or e.status_code != 404:
+                raise
+        
+        # The cached timeseries no longer exists, so look it up again and retry once
+        logger.info("Cached timeseries %s not found, refreshing", timeseries_name)
+        del self._ts_cache[timeseries_name]
+        timeseries = await self.ensure_timeseries_exists(timeseries_name)
+        return await self._make_request(
             "POST",
-            f"/timeseries/{timeseries_id}/datapoints",
-            json=formatted_datapoints
+            f"/timeseries/{timeseries['timeseries_id']}/datapoints",
+            json=datapoints
         )
 
+class TestPayload(msgspec.Struct, frozen=True):
+    """Test results summary; fields missing from the input default to zero."""
+    tests: int = 0
+    passed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    duration: float = 0.0
+
 def parse_test_results(test_results: str) -> Dict[str, Any]:
     """Parse test results and extract relevant metrics.
     
@@ -131,51 +319,43 @@ def parse_test_results(test_results: str) -> Dict[str, Any]:
         test_results: JSON string containing test results
         
     Returns:
-        Dictionary containing test metrics
+        Dictionary containing the run context, plus parallel 'names' and
+        'values' lists with one entry per metric
     """
     try:
-        test_data = json.loads(test_results)
+        # strict=False accepts integral floats such as 10.0 for the count fields
+        test_data = msgspec.json.decode(test_results, type=TestPayload, strict=False)
         timestamp = datetime.now(timezone.utc).isoformat()
         
         # Calculate metrics
-        total = test_data.get("tests", 0)
-        passed = test_data.get("passed", 0)
-        failed = test_data.get("failed", 0)
-        skipped = test_data.get("skipped", 0)
-        duration = test_data.get("duration", 0)
+        total = test_data.tests
+        passed = test_data.passed
+        failed = test_data.failed
+        skipped = test_data.skipped
+        duration = test_data.duration
         success_rate = (passed / total * 100) if total > 0 else 0
         
-        # Get repository and workflow context
-        repo = os.getenv("GITHUB_REPOSITORY", "unknown").replace('/', '.')
-        workflow = os.getenv("GITHUB_WORKFLOW", "unknown").replace(' ', '_').lower()
-        run_id = os.getenv("GITHUB_RUN_ID", "")
-        
-        # Create datapoints for each metric
-        datapoints = [
-            # Test counts
-            {"name": f"{repo}.tests.total", "value": total, "timestamp": timestamp},
-            {"name": f"{repo}.tests.passed", "value": passed, "timestamp": timestamp},
-            {"name": f"{repo}.tests.failed", "value": failed, "timestamp": timestamp},
-            {"name": f"{repo}.tests.skipped", "value": skipped, "timestamp": timestamp},
-            
-            # Derived metrics
-            {"name": f"{repo}.tests.success_rate", "value": success_rate, "timestamp": timestamp},
-            {"name": f"{repo}.tests.duration_seconds", "value": duration, "timestamp": timestamp},
-            
-            # Context
-            {"name": f"{repo}.workflow", "value": 1, "timestamp": timestamp, "tags": {"workflow": workflow, "run_id": run_id}}
-        ]
-        
+        # One datapoint per metric, stored as parallel arrays: values[i] belongs to names[i].
+        # The order is test counts, derived metrics, then the workflow context marker.
         return {
             "timestamp": timestamp,
-            "repository": repo,
-            "workflow": workflow,
-            "run_id": run_id,
-            "datapoints": datapoints
+            "repository": _REPO,
+            "workflow": _WORKFLOW,
+            "run_id": _RUN_ID,
+            "names": [
+                _METRIC_TOTAL, _METRIC_PASSED, _METRIC_FAILED, _METRIC_SKIPPED,
+                _METRIC_SUCCESS_RATE, _METRIC_DURATION,
+                _METRIC_WORKFLOW
+            ],
+            "values": [
+                total, passed, failed, skipped,
+                success_rate, duration,
+                1
+            ]
         }
         
-    except (json.JSONDecodeError, KeyError) as e:
-        logger.error(f"Error parsing test results: {e}")
+    except msgspec.DecodeError as e:
+        logger.error("Error parsing test results: %s", e)
         raise ValueError(f"Invalid test results format: {e}") from e
 
 def send_test_metrics(test_results: str, api_key: str = None, base_url: str = None) -> Dict[str, Any]:
@@ -189,30 +369,43 @@ def send_test_metrics(test_results: str, api_key: str = None, base_url: str = No
     Returns:
         Dictionary with results of the operation
     """
+    return asyncio.run(_send_test_metrics(test_results, api_key=api_key, base_url=base_url))
+
+async def _send_test_metrics(test_results: str, api_key: str = None, base_url: str = None) -> Dict[str, Any]:
+    """Coroutine behind send_test_metrics; sends the timeseries batches concurrently."""
     try:
         # Parse test results
         metrics = parse_test_results(test_results)
-        logger.info(f"Parsed test metrics for {metrics['repository']}")
+        logger.info("Parsed test metrics for %s", metrics["repository"])
         
-        # Initialize API client
-        api = TimeseriesAPI(api_key=api_key, base_url=base_url)
+        # Group datapoints by timeseries so each series needs a single request
+        timestamp = metrics["timestamp"]
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for name, value in zip(metrics["names"], metrics["values"]):
+            grouped.setdefault(name, []).append({"timestamp": timestamp, "value": value})
         
-        # Send each datapoint to the API
-        results = {}
-        for datapoint in metrics["datapoints"]:
-            timeseries_name = datapoint["name"]
-            point_data = {
-                "timestamp": datapoint["timestamp"],
-                "value": datapoint["value"]
-            }
-            
-            try:
-                result = api.add_datapoints(timeseries_name, [point_data])
-                results[timeseries_name] = "success"
-                logger.debug(f"Sent datapoint for {timeseries_name}")
-            except TimeseriesAPIError as e:
-                results[timeseries_name] = f"error: {str(e)}"
-                logger.error(f"Failed to send datapoint for {timeseries_name}: {e}")
+        # Send the batches for all timeseries to the API concurrently
+        async with AsyncTimeseriesAPI(api_key=api_key, base_url=base_url) as api:
+            outcomes = await asyncio.gather(
+                *(api.add_datapoints(name, points) for name, points in grouped.items()),
+                return_exceptions=True
+            )
+        
+        failures: Dict[str, str] = {}
+        for (timeseries_name, points), outcome in zip(grouped.items(), outcomes):
+            if isinstance(outcome, TimeseriesAPIError):
+                failures[timeseries_name] = str(outcome)
+                logger.error("Failed to send datapoints for %s: %s", timeseries_name, outcome)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                logger.debug("Sent %d datapoint(s) for %s", len(points), timeseries_name)
+        
+        # Report in metric order, whichever series failed
+        results = {
+            name: f"error: {failures[name]}" if name in failures else "success"
+            for name in grouped
+        }
         
         return {
             "success": True,
@@ -223,7 +416,7 @@ def send_test_metrics(test_results: str, api_key: str = None, base_url: str = No
         }
         
     except Exception as e:
-        logger.error(f"Error sending test metrics: {e}")
+        logger.error("Error sending test metrics: %s", e)
         return {
             "success": False,
             "error": str(e)